@@ -1,27 +1,83 @@
 # main.py
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import atexit
 import csv
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import time
 import os
+import time
+import threading
 
 # Importar las claves de la API desde config.py
 from config import SCRAPE_API_KEY
 
-def get_tiktok_profile_data(handle: str, api_key: str) -> dict or None:
+# Sesión HTTP compartida: reutiliza la conexión TLS (keep-alive) entre llamadas
+SESSION = requests.Session()
+SESSION.headers.update({"x-api-key": SCRAPE_API_KEY})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+))
+atexit.register(SESSION.close)
+
+class AdaptiveThrottle:
+    """
+    Pausa adaptativa entre llamadas a la API (AIMD): ante un 429 duplica la espera,
+    y con cada respuesta exitosa la reduce gradualmente hasta el mínimo.
+    """
+    def __init__(self, initial_delay: float = 0.5, min_delay: float = 0.25, max_delay: float = 30.0):
+        self.delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+
+    def on_success(self):
+        with self._lock:
+            self.delay = max(self.delay * 0.95, self.min_delay)
+
+    def on_throttled(self):
+        with self._lock:
+            self.delay = min(self.delay * 2, self.max_delay)
+
+THROTTLE = AdaptiveThrottle()
+
+def rate_limited_get(url: str, params: dict, timeout: int, max_attempts: int = 3) -> requests.Response:
+    """
+    GET sobre la sesión compartida respetando el ritmo de THROTTLE.
+    Si la API responde 429, espera lo indicado en 'Retry-After' (o el retardo actual) y reintenta.
+    """
+    for attempt in range(max_attempts):
+        time.sleep(THROTTLE.delay)
+        response = SESSION.get(url, params=params, timeout=timeout)
+        if response.status_code != 429:
+            if response.ok:
+                THROTTLE.on_success()
+            return response
+
+        THROTTLE.on_throttled()
+        retry_after = response.headers.get("Retry-After", "")
+        wait = float(retry_after) if retry_after.isdigit() else THROTTLE.delay
+        print(f"  ⏳ Límite de peticiones alcanzado (429). Esperando {wait:.1f} s (intento {attempt + 1}/{max_attempts})...")
+        time.sleep(wait)
+    return response
+
+# Número máximo de peticiones simultáneas a la API
+MAX_WORKERS = 8
+
+def get_tiktok_profile_data(handle: str) -> dict or None:
     """
     Realiza una llamada a la API de ScrapeCreators para obtener los datos de un perfil de TikTok.
     """
     url = "https://api.scrapecreators.com/v1/tiktok/profile"
-    headers = {
-        "x-api-key": api_key,
-    }
     params = {
         "handle": handle
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        response = rate_limited_get(url, params, timeout=10)
         response.raise_for_status()  # Lanza una excepción para errores HTTP (4xx o 5xx)
         return response.json()
     except requests.exceptions.RequestException as e:
@@ -55,12 +111,16 @@ def main():
         print("El archivo 'perfiles_tiktok.txt' no se encontró.")
         return
 
-    # 2. Recolectar la información de cada perfil
+    # 2. Recolectar la información de cada perfil (en paralelo, acotado por MAX_WORKERS)
+    print(f"Recolectando datos de {len(perfiles)} perfiles ({MAX_WORKERS} peticiones simultáneas)...")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        resultados = list(pool.map(get_tiktok_profile_data, perfiles))
+
+    # Todos los perfiles se recolectan en la misma ejecución: una sola marca de tiempo para 'lastUpdated'
+    run_ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
     datos_consolidados = []
-    for i, perfil in enumerate(perfiles):
-        print(f"Recolectando datos para el perfil: {perfil}...")
-        data = get_tiktok_profile_data(perfil, SCRAPE_API_KEY)
-        
+    for perfil, data in zip(perfiles, resultados):
         if data and data.get('user') and data.get('stats'):
             user_data = data['user']
             stats_data = data['stats']
@@ -82,17 +142,13 @@ def main():
             perfil_info['isVerified'] = user_data.get('verified', 'N/A')
             perfil_info['privateAccount'] = user_data.get('privateAccount', 'N/A')
             perfil_info['diggCount'] = stats_data.get('diggCount', 0)
-            perfil_info['lastUpdated'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            perfil_info['lastUpdated'] = run_ts
 
             datos_consolidados.append(perfil_info)
             perfiles_encontrados += 1
             print(f"✔️ Datos de {perfil} recolectados exitosamente.")
         else:
             print(f"❌ No se pudieron obtener datos completos para el perfil {perfil}.")
-            
-        # Espera para evitar sobrecargar la API y manejar límites de velocidad
-        if i < len(perfiles) - 1:
-            time.sleep(2)  # Pausa de 2 segundos entre cada llamada
 
     if not datos_consolidados:
         print("No se encontraron datos de perfiles válidos para exportar.")
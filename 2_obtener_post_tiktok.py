@@ -1,11 +1,24 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import atexit
 import csv
+import gzip
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
+import queue
+import threading
 import time
 from datetime import datetime, date
-import pandas as pd
 import json
 
+# orjson (opcional) decodifica las páginas de 'aweme_list' bastante más rápido que json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 # --- CONFIGURACIÓN E INICIALIZACIÓN ---
 try:
     # Asegúrate de que tu archivo 'config.py' existe y contiene la variable 'SCRAPE_API_KEY'.
@@ -16,16 +29,71 @@ except ImportError:
 
 # --- CONSTANTES GLOBALES ---
 PROFILES_FILE = "perfiles_tiktok.txt"
-OUTPUT_CSV_FILE_TIKTOK = "base_de_datos_tiktok.csv"
-BATCH_SIZE = 5             # Guardar el progreso cada 5 archivos nuevos
+# True: guardar la base como CSV comprimido con gzip ('.gz'). Los scripts 3, 4, 5 y 8 detectan
+# solos cuál versión existe; al activarlo con una base ya creada, comprimirla antes (gzip base_de_datos_tiktok.csv)
+COMPRESS = False
+OUTPUT_CSV_FILE_TIKTOK = "base_de_datos_tiktok.csv" + (".gz" if COMPRESS else "")
+BATCH_SIZE = 1000          # Volcar al CSV cada 1000 posts nuevos (un solo writerows por lote)
 DUPLICATE_THRESHOLD = 4    # Detenerse si 4 o más posts son duplicados en la página
+WRITE_BUFFER_SIZE = 4 * 1024 * 1024  # Búfer de escritura del CSV (4 MiB); se vacía al cerrar
+MAX_WORKERS = 8            # Perfiles procesados en paralelo
 
 # Endpoint de la API
 BASE_URL_POSTS = "https://api.scrapecreators.com/v3/tiktok/profile/videos"
 
-HEADERS = {
-    "x-api-key": SCRAPE_API_KEY
-}
+# Sesión HTTP compartida: reutiliza la conexión TLS (keep-alive) entre llamadas
+SESSION = requests.Session()
+SESSION.headers.update({"x-api-key": SCRAPE_API_KEY})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+))
+atexit.register(SESSION.close)
+
+class AdaptiveThrottle:
+    """
+    Pausa adaptativa entre llamadas a la API (AIMD): ante un 429 duplica la espera,
+    y con cada respuesta exitosa la reduce gradualmente hasta el mínimo.
+    """
+    def __init__(self, initial_delay: float = 0.5, min_delay: float = 0.25, max_delay: float = 30.0):
+        self.delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+
+    def on_success(self):
+        with self._lock:
+            self.delay = max(self.delay * 0.95, self.min_delay)
+
+    def on_throttled(self):
+        with self._lock:
+            self.delay = min(self.delay * 2, self.max_delay)
+
+THROTTLE = AdaptiveThrottle()
+
+def rate_limited_get(url: str, params: dict, timeout: int, max_attempts: int = 3) -> requests.Response:
+    """
+    GET sobre la sesión compartida respetando el ritmo de THROTTLE.
+    Si la API responde 429, espera lo indicado en 'Retry-After' (o el retardo actual) y reintenta.
+    """
+    for attempt in range(max_attempts):
+        time.sleep(THROTTLE.delay)
+        response = SESSION.get(url, params=params, timeout=timeout)
+        if response.status_code != 429:
+            if response.ok:
+                THROTTLE.on_success()
+            return response
+
+        THROTTLE.on_throttled()
+        retry_after = response.headers.get("Retry-After", "")
+        wait = float(retry_after) if retry_after.isdigit() else THROTTLE.delay
+        print(f"  ⏳ Límite de peticiones alcanzado (429). Esperando {wait:.1f} s (intento {attempt + 1}/{max_attempts})...")
+        time.sleep(wait)
+    return response
+
+# Tabla de traducción para limpiar descripciones en una sola pasada (\n -> espacio, \r -> eliminado)
+_DESC_TRANS = str.maketrans({'\n': ' ', '\r': None})
 
 # Definición del encabezado final
 FIELDNAMES_TIKTOK = [
@@ -50,17 +118,35 @@ def get_start_of_current_month_timestamp() -> int:
     return int(start_of_month.timestamp())
 
 
+def open_csv(filename: str, mode: str, compressed: bool = None, **kwargs):
+    """
+    Abre un CSV en modo texto. Si está comprimido (por defecto: nombre terminado en '.gz')
+    usa gzip con compresslevel=1, que apenas consume CPU frente a la espera de la API.
+    """
+    if compressed is None:
+        compressed = filename.endswith('.gz')
+    if compressed:
+        kwargs.pop('buffering', None)  # gzip gestiona su propio búfer
+        return gzip.open(filename, mode + 't', compresslevel=1, **kwargs)
+    return open(filename, mode, **kwargs)
+
 def load_existing_timestamps(filename: str) -> set:
     """ 
     Carga los timestamps UNIX (identificadores únicos) existentes para deduplicación. 
+    Recorre el CSV en streaming leyendo solo la columna 'create_time' y los devuelve como enteros.
     """
     existing_timestamps = set()
     if os.path.exists(filename):
         try:
-            # Lectura del CSV forzando 'create_time' a string
-            df_existing = pd.read_csv(filename, dtype={'create_time': str})
-            
-            existing_timestamps = set(df_existing['create_time'].dropna())
+            with open_csv(filename, 'r', newline='', encoding='utf-8') as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header:
+                    # Posición fija de la columna, tomada del encabezado
+                    col = header.index('create_time')
+                    for row in reader:
+                        if len(row) > col and row[col].isdigit():
+                            existing_timestamps.add(int(row[col]))
             
         except Exception as e:
             print(f"⚠️ Advertencia: No se pudo cargar el historial de timestamps. Error: {e}. Se continuará con set vacío.")
@@ -72,17 +158,16 @@ def get_tiktok_videos_page(handle: str, cursor: str or None) -> dict or None:
     Realiza una llamada a la API para obtener videos.
     """
     url = BASE_URL_POSTS
-    headers = {"x-api-key": SCRAPE_API_KEY}
     params = {"handle": handle}
     
     if cursor:
         params["max_cursor"] = cursor
     
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=20)
+        response = rate_limited_get(url, params, timeout=20)
         response.raise_for_status()
         
-        data = response.json()
+        data = json_loads(response.content)
         
         if not isinstance(data, dict) or data.get('status_code') != 0:
              print(f"  ⚠️ Error de API: {data.get('status_msg', 'Mensaje de error no disponible')}")
@@ -100,24 +185,152 @@ def get_tiktok_videos_page(handle: str, cursor: str or None) -> dict or None:
         print(f"❌ Ocurrió un error inesperado al obtener videos de {handle}: {e}")
         return None
 
-def save_batch_to_csv_tiktok(data_batch: list, file_name: str, total_new_posts_added: int):
-    """ Guarda el lote de datos y actualiza la consola. """
+def save_batch_to_csv_tiktok(data_batch: list, writer, total_new_posts_added: int):
+    """ Escribe el lote de datos en el CSV ya abierto y actualiza la consola. """
     try:
-        # Determinar si se debe escribir el encabezado
-        write_header = not os.path.exists(file_name) or os.path.getsize(file_name) == 0
-        
-        with open(file_name, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=FIELDNAMES_TIKTOK)
-
-            if write_header:
-                writer.writeheader()
-
-            writer.writerows(data_batch)
+        writer.writerows(data_batch)
         print(f"  💾 Guardado incremental exitoso. Total de posts únicos añadidos hasta ahora: {total_new_posts_added}.")
         
     except Exception as e:
         print(f"❌ Error al escribir en el archivo CSV: {e}")
 
+def csv_writer_worker(write_queue: queue.Queue, writer):
+    """ 
+    Hilo escritor: único dueño del CSV. Escribe los lotes que llegan por la cola hasta recibir None.
+    """
+    total_written = 0
+    while True:
+        batch = write_queue.get()
+        if batch is None:
+            break
+        total_written += len(batch)
+        save_batch_to_csv_tiktok(batch, writer, total_written)
+
+def fetch_profile(perfil: str, month_limit_ts: int, existing_timestamps: set,
+                  timestamps_lock: threading.Lock, write_queue: queue.Queue) -> int:
+    """ 
+    Pagina los videos de un perfil, filtra por mes y duplicados, y envía los posts nuevos
+    al hilo escritor por lotes de BATCH_SIZE. Retorna el número de posts nuevos del perfil.
+    """
+    max_cursor = None
+    posts_added_in_current_profile = 0
+    new_data_batch = []
+    
+    # BUCLE DE PAGINACIÓN
+    while True:
+        videos_data_json = get_tiktok_videos_page(perfil, max_cursor)
+        
+        if not videos_data_json: 
+            break
+            
+        posts = videos_data_json.get('aweme_list')
+        max_cursor = videos_data_json.get('max_cursor')
+        
+        if not posts:
+            print(f"  > API no devolvió posts en esta página. Finalizando para {perfil}.")
+            break
+
+        print(f"  > [{perfil}] Procesando lote de {len(posts)} publicaciones de la API. Añadidos en este perfil: {posts_added_in_current_profile} (hasta ahora).")
+        
+        duplicate_count_in_page = 0
+        non_pinned_total = 0       # Posts no anclados en la página
+        non_pinned_below = 0       # ...de ellos, anteriores al mes actual
+        
+        # ITERACIÓN DE POSTS
+        for video in posts:
+            # create_time es el timestamp UNIX (el ID ÚNICO); la API lo entrega como entero
+            create_time_int = video.get('create_time', 'N/A')
+            
+            if not isinstance(create_time_int, int):
+                try:
+                    create_time_int = int(create_time_int)
+                except (TypeError, ValueError):
+                    print(f"  ⚠️ Advertencia: Timestamp inválido '{create_time_int}'. Saltando post.")
+                    continue
+            
+            # Los posts anclados ('is_top') rompen el orden cronológico; solo se cuentan los demás
+            if not video.get('is_top'):
+                non_pinned_total += 1
+                if create_time_int < month_limit_ts:
+                    non_pinned_below += 1
+            
+            # 🛑 LÓGICA DE FILTRADO TEMPORAL 🛑
+            # Si el post es anterior al mes actual, NO lo guardamos ni lo contamos, pero CONTINUAMOS
+            if create_time_int < month_limit_ts:
+                # En lugar de detener la paginación, solo descartamos el post y continuamos
+                # Esto permite que los posts anclados no frenen el proceso.
+                continue
+            
+            # 1. Lógica de Deduplicación (consulta y registro atómicos: el set es compartido entre hilos)
+            with timestamps_lock:
+                is_duplicate = create_time_int in existing_timestamps
+                if not is_duplicate:
+                    existing_timestamps.add(create_time_int)
+            if is_duplicate:
+                duplicate_count_in_page += 1
+                continue # Saltar post duplicado
+            
+            # --- Lógica de procesamiento de Post NUEVO Y RECIENTE ---
+            stats = video.get('statistics', {})
+            
+            # Formatear el timestamp a fecha legible (hora local) directamente en C, sin objeto datetime
+            readable_date_str = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(create_time_int))
+
+            # Fila como tupla en el orden exacto de FIELDNAMES_TIKTOK (csv.writer no mapea claves)
+            post_data = (
+                perfil,                                                          # profile_handle
+                video.get('aweme_id', 'N/A'),                                    # video_id
+                video.get('desc', 'N/A').translate(_DESC_TRANS),                 # description
+                create_time_int,                                                 # create_time
+                readable_date_str,                                               # readable_date
+                video.get('share_info', {}).get('share_url', video.get('url', 'N/A')),  # url
+            
+                stats.get('play_count', 0),
+                stats.get('digg_count', 0),
+                stats.get('comment_count', 0),
+                stats.get('share_count', 0),
+                stats.get('collect_count', 0),
+                stats.get('download_count', 0),
+                stats.get('repost_count', 0),
+                stats.get('whatsapp_share_count', 0),
+                'N/A'                                                            # transcript
+            )
+            
+            # 2. Almacenamiento y Contabilidad
+            new_data_batch.append(post_data)
+            posts_added_in_current_profile += 1
+
+            # 3. Guardado Incremental (BATCH_SIZE): el lote pasa al hilo escritor
+            if len(new_data_batch) >= BATCH_SIZE:
+                write_queue.put(new_data_batch)
+                new_data_batch = [] 
+        
+        # --- MANEJO DE PARADA POR DENSIDAD (DUPLICATE_THRESHOLD) ---
+        should_break = False
+
+        if duplicate_count_in_page >= DUPLICATE_THRESHOLD:
+            print(f"  🛑 ALERTA DE PARADA: Se encontraron {duplicate_count_in_page} posts duplicados en esta página de {len(posts)} posts. Deteniendo búsqueda para {perfil}.")
+            should_break = True
+        
+        # --- PARADA POR ANTIGÜEDAD ---
+        # La API devuelve los posts en orden cronológico inverso: si todos los no anclados de esta
+        # página son anteriores al mes actual, las páginas siguientes tampoco aportarán posts.
+        if not should_break and non_pinned_total > 0 and non_pinned_below == non_pinned_total:
+            print(f"  🛑 Todos los posts no anclados de esta página son anteriores al mes actual. Deteniendo búsqueda para {perfil}.")
+            should_break = True
+        
+        # 4. Salir si hubo parada o la API no tiene más páginas
+        if should_break or not max_cursor or videos_data_json.get('has_more') == 0:
+            break # Sale del bucle WHILE de paginación
+
+        # La pausa entre paginaciones la aplica rate_limited_get según THROTTLE.delay
+
+    # Enviar el lote restante del perfil (si lo hay)
+    if new_data_batch:
+        write_queue.put(new_data_batch)
+
+    return posts_added_in_current_profile
+
 # --- FUNCIÓN PRINCIPAL ---
 def main():
     print("🚀 Iniciando el colector de videos de TikTok con lógica de parada por densidad y filtrado por mes.")
@@ -141,124 +354,45 @@ def main():
     print(f"✅ Se cargaron {len(existing_timestamps)} posts existentes para deduplicación.")
 
     total_new_posts_added = 0
-    new_data_batch = []
+    timestamps_lock = threading.Lock()
+    write_queue = queue.Queue()
     
-    # -------------------------------------------------------------
-    # BUCLE PRINCIPAL DE PERFILES
-    # -------------------------------------------------------------
-    for i, perfil in enumerate(perfiles):
-        print(f"\n--- Procesando perfil {i+1}/{len(perfiles)}: {perfil} ---")
-        
-        max_cursor = None
-        posts_added_in_current_profile = 0
-        
-        # BUCLE DE PAGINACIÓN
-        while True:
-            videos_data_json = get_tiktok_videos_page(perfil, max_cursor)
-            
-            if not videos_data_json: 
-                break
-                
-            posts = videos_data_json.get('aweme_list')
-            max_cursor = videos_data_json.get('max_cursor')
-            
-            if not posts:
-                print(f"  > API no devolvió posts en esta página. Finalizando para {perfil}.")
-                break
+    # El CSV se abre una sola vez para toda la ejecución (modo 'a' para conservar el historial)
+    # Se consulta el tamaño una sola vez: en gzip, tell() cuenta bytes descomprimidos de la sesión y no sirve
+    write_header = not os.path.exists(OUTPUT_CSV_FILE_TIKTOK) or os.path.getsize(OUTPUT_CSV_FILE_TIKTOK) == 0
+    out = open_csv(OUTPUT_CSV_FILE_TIKTOK, 'a', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+    writer = csv.writer(out)
+    if write_header:
+        writer.writerow(FIELDNAMES_TIKTOK)
 
-            print(f"  > Procesando lote de {len(posts)} publicaciones de la API. Total añadidos: {total_new_posts_added} (hasta ahora).")
-            
-            duplicate_count_in_page = 0
-            new_timestamps_to_add = set()
+    # Hilo escritor dedicado: es el único que toca el CSV, así los perfiles no necesitan bloquearlo
+    writer_thread = threading.Thread(target=csv_writer_worker, args=(write_queue, writer), daemon=True)
+    writer_thread.start()
+
+    try:
+        # -------------------------------------------------------------
+        # PERFILES EN PARALELO (como máximo MAX_WORKERS a la vez)
+        # -------------------------------------------------------------
+        print(f"\n--- Procesando {len(perfiles)} perfiles ({MAX_WORKERS} en paralelo) ---")
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = {
+                pool.submit(fetch_profile, perfil, MONTH_LIMIT_TS, existing_timestamps, timestamps_lock, write_queue): perfil
+                for perfil in perfiles
+            }
             
-            # ITERACIÓN DE POSTS
-            for video in posts:
-                # create_time es el timestamp UNIX (el ID ÚNICO)
-                create_time_str = str(video.get('create_time', 'N/A'))
-                
+            for i, future in enumerate(as_completed(futures), start=1):
+                perfil = futures[future]
                 try:
-                    create_time_int = int(create_time_str)
-                except ValueError:
-                    print(f"  ⚠️ Advertencia: Timestamp inválido '{create_time_str}'. Saltando post.")
-                    continue
-                
-                # 🛑 LÓGICA DE FILTRADO TEMPORAL 🛑
-                # Si el post es anterior al mes actual, NO lo guardamos ni lo contamos, pero CONTINUAMOS
-                if create_time_int < MONTH_LIMIT_TS:
-                    # En lugar de detener la paginación, solo descartamos el post y continuamos
-                    # Esto permite que los posts anclados no frenen el proceso.
+                    posts_added_in_current_profile = future.result()
+                except Exception as e:
+                    print(f"❌ Ocurrió un error inesperado al procesar el perfil {perfil}: {e}")
                     continue
-                
-                # 1. Lógica de Deduplicación
-                if create_time_str in existing_timestamps:
-                    duplicate_count_in_page += 1
-                    continue # Saltar post duplicado
-                
-                # --- Lógica de procesamiento de Post NUEVO Y RECIENTE ---
-                stats = video.get('statistics', {})
-                
-                # Formatear el timestamp a fecha legible 
-                readable_date_str = datetime.fromtimestamp(create_time_int).strftime('%Y-%m-%d %H:%M:%S')
-
-                post_data = {
-                    'profile_handle': perfil,
-                    'video_id': video.get('aweme_id', 'N/A'),
-                    'description': video.get('desc', 'N/A').replace('\n', ' ').replace('\r', ''),
-                    'create_time': create_time_str, 
-                    'readable_date': readable_date_str, 
-                    'url': video.get('share_info', {}).get('share_url', video.get('url', 'N/A')), 
-                    
-                    'play_count': stats.get('play_count', 0),
-                    'digg_count': stats.get('digg_count', 0),
-                    'comment_count': stats.get('comment_count', 0),
-                    'share_count': stats.get('share_count', 0),
-                    'collect_count': stats.get('collect_count', 0),
-                    'download_count': stats.get('download_count', 0),
-                    'repost_count': stats.get('repost_count', 0),
-                    'whatsapp_share_count': stats.get('whatsapp_share_count', 0),
-                    'transcript': 'N/A' 
-                }
-                
-                # 2. Almacenamiento y Contabilidad
-                new_data_batch.append(post_data)
-                total_new_posts_added += 1
-                posts_added_in_current_profile += 1
-                new_timestamps_to_add.add(create_time_str)
-
-                # 3. Guardado Incremental (BATCH_SIZE)
-                if len(new_data_batch) >= BATCH_SIZE:
-                    save_batch_to_csv_tiktok(new_data_batch, OUTPUT_CSV_FILE_TIKTOK, total_new_posts_added)
-                    existing_timestamps.update(new_timestamps_to_add) 
-                    new_data_batch = [] 
-                    new_timestamps_to_add = set()
-            
-            # --- MANEJO DE PARADA POR DENSIDAD (DUPLICATE_THRESHOLD) ---
-            should_break = False
-
-            if duplicate_count_in_page >= DUPLICATE_THRESHOLD:
-                print(f"  🛑 ALERTA DE PARADA: Se encontraron {duplicate_count_in_page} posts duplicados en esta página de {len(posts)} posts. Deteniendo búsqueda para {perfil}.")
-                should_break = True
-            
-            # 4. Consolidar y salir si es necesario
-            if should_break or not max_cursor or videos_data_json.get('has_more') == 0:
-                # Guardar el lote restante (si lo hay)
-                if new_data_batch:
-                   save_batch_to_csv_tiktok(new_data_batch, OUTPUT_CSV_FILE_TIKTOK, total_new_posts_added)
-                   # Marcar estos últimos posts nuevos como vistos
-                   existing_timestamps.update(new_timestamps_to_add)
-                   new_data_batch = []
-                
-                if should_break:
-                    break # Sale del bucle WHILE de paginación
-            
-            # Si no hubo parada, consolidamos los nuevos posts en el set principal
-            existing_timestamps.update(new_timestamps_to_add) 
-
-            # Pausa entre paginaciones
-            time.sleep(2)
-            
-        print(f"  ✅ Perfil {perfil} procesado. Posts nuevos añadidos en este perfil: {posts_added_in_current_profile}.")
-        time.sleep(5) # Pausa más larga entre perfiles
+                total_new_posts_added += posts_added_in_current_profile
+                print(f"  ✅ Perfil {perfil} procesado ({i}/{len(perfiles)}). Posts nuevos añadidos en este perfil: {posts_added_in_current_profile}.")
+    finally:
+        write_queue.put(None)
+        writer_thread.join()
+        out.close()
         
     print(f"\n🎉 PROCESO COMPLETADO. Total de posts únicos añadidos: {total_new_posts_added}.")
 
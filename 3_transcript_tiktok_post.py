@@ -1,29 +1,96 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import atexit
 import csv
-import pandas as pd
-import time
+import gzip
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import os
+import time
+import threading
 import re
 
 # Importar la clave de la API desde config.py
 # Asegúrate de que esta línea esté correcta en tu entorno:
 from config import SCRAPE_API_KEY
 
-def get_tiktok_transcript(video_url: str, api_key: str, lang: str = 'es') -> str or None:
+# Sesión HTTP compartida: reutiliza la conexión TLS (keep-alive) entre llamadas
+SESSION = requests.Session()
+SESSION.headers.update({"x-api-key": SCRAPE_API_KEY})
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=20,
+    pool_maxsize=50,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+))
+atexit.register(SESSION.close)
+
+class AdaptiveThrottle:
+    """
+    Pausa adaptativa entre llamadas a la API (AIMD): ante un 429 duplica la espera,
+    y con cada respuesta exitosa la reduce gradualmente hasta el mínimo.
+    """
+    def __init__(self, initial_delay: float = 0.5, min_delay: float = 0.25, max_delay: float = 30.0):
+        self.delay = initial_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+
+    def on_success(self):
+        with self._lock:
+            self.delay = max(self.delay * 0.95, self.min_delay)
+
+    def on_throttled(self):
+        with self._lock:
+            self.delay = min(self.delay * 2, self.max_delay)
+
+THROTTLE = AdaptiveThrottle()
+
+def rate_limited_get(url: str, params: dict, timeout: int, max_attempts: int = 3) -> requests.Response:
+    """
+    GET sobre la sesión compartida respetando el ritmo de THROTTLE.
+    Si la API responde 429, espera lo indicado en 'Retry-After' (o el retardo actual) y reintenta.
+    """
+    for attempt in range(max_attempts):
+        time.sleep(THROTTLE.delay)
+        response = SESSION.get(url, params=params, timeout=timeout)
+        if response.status_code != 429:
+            if response.ok:
+                THROTTLE.on_success()
+            return response
+
+        THROTTLE.on_throttled()
+        retry_after = response.headers.get("Retry-After", "")
+        wait = float(retry_after) if retry_after.isdigit() else THROTTLE.delay
+        print(f"  ⏳ Límite de peticiones alcanzado (429). Esperando {wait:.1f} s (intento {attempt + 1}/{max_attempts})...")
+        time.sleep(wait)
+    return response
+
+# Número máximo de transcripciones solicitadas en paralelo
+MAX_WORKERS = 8
+# Filas leídas por adelantado mientras sus transcripciones están en vuelo (acota la memoria)
+PENDING_WINDOW = MAX_WORKERS * 4
+# Búfer de escritura del CSV temporal (1 MiB)
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Patrones de limpieza del formato WEBVTT (compilados una sola vez)
+_VTT_TIMESTAMP_RE = re.compile(r'(\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}\n)')
+_WEBVTT_RE = re.compile(r'WEBVTT\n\n')
+
+def get_tiktok_transcript(video_url: str, lang: str = 'es') -> str or None:
     """
     Realiza una llamada a la API de ScrapeCreators para obtener la transcripción de un video.
     """
     url = "https://api.scrapecreators.com/v1/tiktok/video/transcript"
-    headers = {
-        "x-api-key": api_key,
-    }
     params = {
         "url": video_url,
         "language": lang
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params, timeout=20)
+        response = rate_limited_get(url, params, timeout=20)
         response.raise_for_status()
         data = response.json()
         
@@ -35,8 +102,8 @@ def get_tiktok_transcript(video_url: str, api_key: str, lang: str = 'es') -> str
             return "TRANSCRIPCION_NO_DISPONIBLE" # Usar una marca de error específica
 
         # Limpiar el texto: remover timestamps y otros metadatos
-        clean_text = re.sub(r'(\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}\n)', '', transcript_text)
-        clean_text = re.sub(r'WEBVTT\n\n', '', clean_text)
+        clean_text = _VTT_TIMESTAMP_RE.sub('', transcript_text)
+        clean_text = _WEBVTT_RE.sub('', clean_text)
         clean_text = clean_text.replace('\n', ' ').strip()
         
         return clean_text
@@ -48,94 +115,202 @@ def get_tiktok_transcript(video_url: str, api_key: str, lang: str = 'es') -> str
         print(f"❌ Ocurrió un error inesperado al procesar la transcripción: {e}")
         return None
 
+# Idioma con el que se intenta primero cada perfil (profile_handle -> 'es' | 'en')
+LANG_CACHE = {}
+
+def get_transcript_for_profile(video_url: str, profile_handle: str) -> str or None:
+    """
+    Pide la transcripción primero en el idioma recordado para el perfil (por defecto 'es').
+    Si la API responde bien pero sin transcripción, reintenta una vez en el otro idioma y,
+    si funciona, lo recuerda como primer intento para los siguientes videos del perfil.
+    Los errores de red/HTTP (ya reintentados por la sesión) no se repiten.
+    """
+    lang = LANG_CACHE.get(profile_handle, 'es')
+    transcript = get_tiktok_transcript(video_url, lang=lang)
+    if transcript != "TRANSCRIPCION_NO_DISPONIBLE":
+        return transcript
+
+    other_lang = 'en' if lang == 'es' else 'es'
+    retry = get_tiktok_transcript(video_url, lang=other_lang)
+    if retry is not None and retry != "TRANSCRIPCION_NO_DISPONIBLE":
+        LANG_CACHE[profile_handle] = other_lang
+        return retry
+    return transcript
+
+    retry = get_tiktok_transcript(video_url, lang='en')
+    if retry is not None and retry != "TRANSCRIPCION_NO_DISPONIBLE":
+        LANG_CACHE[profile_handle] = 'en'
+        return retry
+    return transcript
+
+def open_csv(filename: str, mode: str, compressed: bool = None, **kwargs):
+    """
+    Abre un CSV en modo texto. Si está comprimido (por defecto: nombre terminado en '.gz')
+    usa gzip con compresslevel=1, que apenas consume CPU frente a la espera de la API.
+    """
+    if compressed is None:
+        compressed = filename.endswith('.gz')
+    if compressed:
+        kwargs.pop('buffering', None)  # gzip gestiona su propio búfer
+        return gzip.open(filename, mode + 't', compresslevel=1, **kwargs)
+    return open(filename, mode, **kwargs)
+
+def find_database(filename: str) -> str:
+    """
+    Devuelve la ruta de la base de datos: 'filename' o su versión comprimida 'filename.gz'
+    (la que genera 2_obtener_post_tiktok.py con COMPRESS = True). Si existen ambas, la más reciente.
+    """
+    candidates = [path for path in (filename, filename + '.gz') if os.path.exists(path)]
+    return max(candidates, key=os.path.getmtime) if candidates else filename
+
+def load_sidecar(sidecar_filename: str) -> dict:
+    """
+    Carga las transcripciones (video_id -> transcript) que una ejecución interrumpida dejó en el registro JSONL.
+    Una línea incompleta (p. ej. cortada por una interrupción) se descarta sin afectar a las demás.
+    """
+    recovered = {}
+    if os.path.exists(sidecar_filename):
+        try:
+            with open(sidecar_filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    recovered[entry['video_id']] = entry['transcript']
+        except Exception as e:
+            print(f"⚠️ Advertencia: No se pudo leer '{sidecar_filename}'. Error: {e}. Se continuará sin recuperar transcripciones.")
+    return recovered
+
 def main():
     """
     Función principal para leer el CSV, obtener transcripciones y actualizar el archivo.
     Busca específicamente 'N/A' en la columna 'transcript' para reanudar el trabajo.
+    El archivo se procesa en streaming: cada fila se lee, se completa y se escribe en un
+    archivo temporal que reemplaza al original al final (os.replace).
     """
-    input_filename = "base_de_datos_tiktok.csv"
-    output_filename = "base_de_datos_tiktok.csv"
-    
-    # Tamaño del lote para el guardado incremental
-    BATCH_SIZE = 5 
+    # La base puede estar comprimida con gzip (COMPRESS en 2_obtener_post_tiktok.py);
+    # el archivo temporal se escribe con la misma compresión que la entrada
+    input_filename = find_database("base_de_datos_tiktok.csv")
+    compressed = input_filename.endswith('.gz')
+    output_filename = input_filename
+    tmp_filename = output_filename + ".tmp"
+    # Registro de solo-anexado: una línea JSON {video_id, transcript} por transcripción obtenida, para poder reanudar
+    sidecar_filename = "transcripciones_parciales.jsonl"
     
     if not os.path.exists(input_filename):
         print(f"El archivo '{input_filename}' no se encontró. Asegúrate de haber ejecutado el script anterior.")
         return
 
-    # Leer el archivo CSV
+    # ♻️ Reanudar: transcripciones obtenidas por una ejecución interrumpida
+    recovered = load_sidecar(sidecar_filename)
+    if recovered:
+        print(f"♻️ Se recuperaron {len(recovered)} transcripciones de una ejecución anterior.")
+
+    total_rows = 0
+    pending_rows = 0
+    total_posts_processed_session = 0
+    rows_changed = 0
+
     try:
-        # Forzar la lectura de 'transcript' como string para comparar con "N/A"
-        df = pd.read_csv(input_filename, dtype={'transcript': str}) 
-    except Exception as e:
-        print(f"❌ Error al leer el archivo CSV: {e}")
-        return
-    
-    # 📝 IMPORTANTE: Asegurarse de que la columna exista y que los N/A sean 'N/A' si Pandas los convierte a NaN.
-    if 'transcript' not in df.columns:
-        df['transcript'] = 'N/A'
-    # Rellenar cualquier valor NaN (valor nulo de Pandas) con "N/A" para el filtro
-    df['transcript'] = df['transcript'].fillna('N/A') 
+        with open_csv(input_filename, 'r', newline='', encoding='utf-8') as fi, \
+             open_csv(tmp_filename, 'w', compressed=compressed, newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as fo, \
+             open(sidecar_filename, 'a', encoding='utf-8') as sidecar_fh, \
+             ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            reader = csv.DictReader(fi)
+            fieldnames = list(reader.fieldnames or [])
+            # 📝 IMPORTANTE: Asegurarse de que la columna exista
+            if 'transcript' not in fieldnames:
+                fieldnames.append('transcript')
+            writer = csv.DictWriter(fo, fieldnames=fieldnames)
+            writer.writeheader()
 
-    print(f"✅ Archivo cargado. Total de publicaciones: {len(df)}.")
+            sidecar_lock = threading.Lock()
 
-    # Crear la máscara de filtro: buscar filas donde 'transcript' sea 'N/A'
-    posts_to_process = df[df['transcript'] == 'N/A']
-    
-    if posts_to_process.empty:
-        print("🎉 Todas las publicaciones ya tienen transcripción (o no tienen 'N/A'). Proceso finalizado.")
-        return
-    
-    print(f"⏳ Se encontraron {len(posts_to_process)} publicaciones pendientes de transcripción.")
+            def record_transcript(video_id: str, future):
+                """ 
+                Anexa la transcripción al registro JSONL en cuanto termina su petición (en orden de llegada),
+                sin esperar a que las filas anteriores estén listas. Se ejecuta en el hilo que la completó.
+                """
+                transcript = future.result()
+                if transcript:
+                    with sidecar_lock:
+                        sidecar_fh.write(json.dumps({'video_id': video_id, 'transcript': transcript}, ensure_ascii=False) + '\n')
+                        sidecar_fh.flush()
 
-    # Recorrer solo las filas filtradas
-    posts_processed = 0
-    total_posts_processed_session = 0
-    
-    # Usamos .index para iterar sobre los índices originales del DataFrame
-    for index in posts_to_process.index:
-        row = df.loc[index]
-        video_url = row.get('url')
-        
-        # Doble verificación: si la URL falta, marcamos como error y continuamos
-        if pd.isna(video_url) or video_url.strip() == '':
-             df.loc[index, 'transcript'] = "URL_NO_VALIDA"
-             continue
+            # (nº de fila, fila, futuro) en orden de lectura; futuro es None si la fila no requiere API
+            in_flight = deque()
 
-        print(f"Procesando fila (original): {index + 1}/{len(df)} | URL: {video_url[:50]}...")
-        
-        # Obtener la transcripción
-        transcript = get_tiktok_transcript(video_url, SCRAPE_API_KEY, lang='es')
-        
-        if transcript:
-            # Si hubo éxito, guardamos la transcripción
-            df.loc[index, 'transcript'] = transcript
-            print(f"✔️ Transcripción obtenida (Tamaño: {len(transcript)} caracteres).")
-        else:
-            # Si falló (Error de API, conexión, etc.), guardamos la marca de error para no reintentar de inmediato
-            df.loc[index, 'transcript'] = "FALLO_API_REINTENTAR"
-            print(f"❌ Fallo al obtener transcripción para la URL: {video_url}.")
-
-
-        posts_processed += 1
-        total_posts_processed_session += 1
-        
-        # 💾 Guardado Incremental 💾
-        if total_posts_processed_session % BATCH_SIZE == 0:
-            df.to_csv(output_filename, index=False, quoting=csv.QUOTE_ALL)
-            print(f"\n💾 Avance guardado. Se actualizaron {BATCH_SIZE} registros. Total en sesión: {total_posts_processed_session}.")
-            
-        
-        # Pequeña pausa para no sobrecargar la API
-        time.sleep(1)
+            def write_ready_rows(limit: int):
+                """ Escribe (en orden) las filas más antiguas hasta dejar como máximo 'limit' en vuelo. """
+                nonlocal total_posts_processed_session
+                while len(in_flight) > limit:
+                    line, row, future = in_flight.popleft()
+                    if future is not None:
+                        transcript = future.result()
+                        video_url = row['url']
+                        print(f"Procesada fila: {line}/{total_rows} leídas | URL: {video_url[:50]}...")
+
+                        if transcript:
+                            # Si hubo éxito, guardamos la transcripción (ya quedó anexada al registro JSONL)
+                            row['transcript'] = transcript
+                            print(f"✔️ Transcripción obtenida (Tamaño: {len(transcript)} caracteres).")
+                        else:
+                            # Si falló (Error de API, conexión, etc.), guardamos la marca de error para no reintentar de inmediato
+                            row['transcript'] = "FALLO_API_REINTENTAR"
+                            print(f"❌ Fallo al obtener transcripción para la URL: {video_url}.")
+                        total_posts_processed_session += 1
+                    writer.writerow(row)
+
+            for row in reader:
+                total_rows += 1
+                # Un valor vacío equivale al NaN de Pandas: se normaliza a 'N/A' para el filtro
+                original = row.get('transcript')
+                row['transcript'] = original or 'N/A'
+
+                if row['transcript'] == 'N/A' and row.get('video_id') in recovered:
+                    row['transcript'] = recovered[row['video_id']]
+
+                future = None
+                if row['transcript'] == 'N/A':
+                    pending_rows += 1
+                    video_url = (row.get('url') or '').strip()
+                    if not video_url:
+                        # Doble verificación: si la URL falta, marcamos como error
+                        row['transcript'] = "URL_NO_VALIDA"
+                    else:
+                        # Obtener la transcripción (como máximo MAX_WORKERS peticiones en vuelo)
+                        future = pool.submit(get_transcript_for_profile, row['url'], row.get('profile_handle'))
+                        future.add_done_callback(partial(record_transcript, row.get('video_id')))
+
+                if row['transcript'] != original:
+                    rows_changed += 1
+                in_flight.append((total_rows, row, future))
+                write_ready_rows(PENDING_WINDOW)
 
-    # Guardar los datos restantes al final del proceso
-    if total_posts_processed_session % BATCH_SIZE != 0:
-        df.to_csv(output_filename, index=False, quoting=csv.QUOTE_ALL)
-        print(f"\n💾 Proceso finalizado. Se actualizaron los últimos {total_posts_processed_session % BATCH_SIZE} registros. Total en sesión: {total_posts_processed_session}.")
+            write_ready_rows(0)
+
+    except Exception as e:
+        print(f"❌ Error al procesar el archivo CSV: {e}")
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+        return
+
+    print(f"✅ Archivo procesado. Total de publicaciones: {total_rows}. Pendientes encontradas: {pending_rows}.")
+
+    if not rows_changed:
+        # Nada cambió: se descarta el temporal y el archivo original queda intacto
+        os.remove(tmp_filename)
+        print("🎉 Todas las publicaciones ya tienen transcripción (o no tienen 'N/A'). Proceso finalizado.")
     else:
-        # Caso donde el último guardado coincidió con el BATCH_SIZE
+        # 💾 Reemplazo atómico del archivo original por la versión actualizada
+        os.replace(tmp_filename, output_filename)
+        print(f"💾 Base de datos actualizada en '{output_filename}'.")
         print(f"\n🎉 Proceso de extracción de transcripciones completado. Total de transcripciones intentadas: {total_posts_processed_session}.")
 
+    # El registro JSONL ya quedó incorporado a la base
+    if os.path.exists(sidecar_filename):
+        os.remove(sidecar_filename)
+
 if __name__ == "__main__":
     main()
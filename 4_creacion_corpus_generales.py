@@ -1,10 +1,23 @@
 # main.py
 import pandas as pd
 from wordcloud import WordCloud
+import matplotlib
+matplotlib.use('Agg')  # Backend sin ventana: las figuras solo se guardan a disco (también en los procesos hijos)
 import matplotlib.pyplot as plt
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from collections import Counter
 import os
 import re
-from collections import defaultdict
+
+# Procesos para generar las nubes de palabras (None = uno por núcleo)
+MAX_WORKERS = None
+# Palabras más frecuentes que se dibujan en cada nube
+WORDCLOUD_MAX_WORDS = 200
+
+# Patrón único de limpieza de texto: URLs, menciones/hashtags y cualquier carácter
+# que no sea letra o espacio, eliminados en una sola pasada
+_CLEAN_RE = re.compile(r'http\S+|www\S+|@\w+|#\w+|[^a-zA-ZáéíóúüñÁÉÍÓÚÜÑ \t\n\r\f\v]')
 
 def get_spanish_stopwords() -> set:
     """
@@ -24,35 +37,76 @@ def get_spanish_stopwords() -> set:
         'eso', 'está', 'fui', 'fue', 'fuimos', 'fueron'
     }
 
-def clean_text(text: str) -> str:
+# Alternación de stopwords (las más largas primero) para eliminarlas en una sola pasada
+_STOPWORD_RE = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, sorted(get_spanish_stopwords(), key=len, reverse=True))) + r')\b\s*'
+)
+
+def clean_text(texts: pd.Series) -> pd.Series:
+    """
+    Limpia una serie de textos, eliminando URLs, menciones, emojis y caracteres especiales.
+    """
+    return texts.fillna('').astype(str).str.replace(_CLEAN_RE, '', regex=True).str.lower()
+
+def remove_stopwords(text: str) -> str:
     """
-    Limpia el texto, eliminando URLs, menciones, emojis y caracteres especiales.
+    Elimina las stopwords del texto y normaliza los espacios.
     """
-    if not isinstance(text, str):
-        return ""
-    # Eliminar URLs
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    # Eliminar menciones (@usuario) y hashtags
-    text = re.sub(r'@\w+|#\w+', '', text)
-    # Eliminar caracteres especiales y números
-    text = re.sub(r'[^a-zA-ZáéíóúüñÁÉÍÓÚÜÑ\s]', '', text, re.I|re.A)
-    # Convertir a minúsculas
-    text = text.lower()
-    return text
-
-def remove_stopwords(text: str, stop_words: set) -> str:
+    return " ".join(_STOPWORD_RE.sub('', text).split())
+
+def render_profile(output_folder: str, perfil: str, texto_limpio: str) -> None:
+    """
+    Quita las stopwords del texto de un perfil, lo guarda en .txt y genera su nube de palabras.
+    """
+    print(f"Procesando datos para el perfil: {perfil}")
+    
+    # Preprocesamiento del texto
+    texto_sin_stopwords = remove_stopwords(texto_limpio)
+    
+    # a. Guardar el texto en un archivo .txt
+    output_txt_path = os.path.join(output_folder, f"{perfil}_corpus.txt")
+    try:
+        with open(output_txt_path, 'w', encoding='utf-8') as f:
+            f.write(texto_sin_stopwords)
+        print(f"  ✔️ Archivo de texto guardado en: {output_txt_path}")
+    except Exception as e:
+        print(f"  ❌ Error al guardar el archivo de texto para {perfil}: {e}")
+        return
+
+    # b. Generar la nube de palabras
+    if texto_sin_stopwords:
+        # El texto ya viene limpio y sin stopwords: se cuentan las palabras una sola vez y se
+        # pasan las frecuencias directamente, sin el tokenizador interno de WordCloud
+        frecuencias = Counter(texto_sin_stopwords.split()).most_common(WORDCLOUD_MAX_WORDS)
+        wordcloud = WordCloud(
+            width=800, height=400, background_color='white', max_words=WORDCLOUD_MAX_WORDS
+        ).generate_from_frequencies(dict(frecuencias))
+        plt.figure(figsize=(10, 5))
+        plt.imshow(wordcloud, interpolation='bilinear')
+        plt.axis("off")
+        output_png_path = os.path.join(output_folder, f"{perfil}_world_cloud.png")
+        try:
+            plt.savefig(output_png_path)
+            print(f"  ✔️ Nube de palabras guardada en: {output_png_path}")
+            plt.close() # Cierra la figura para evitar que se muestren en pantalla
+        except Exception as e:
+            print(f"  ❌ Error al guardar la nube de palabras para {perfil}: {e}")
+    else:
+        print(f"  ⚠️ No hay texto suficiente para generar la nube de palabras de {perfil}.")
+
+def find_database(filename: str) -> str:
     """
-    Elimina las stopwords del texto.
+    Devuelve la ruta de la base de datos: 'filename' o su versión comprimida 'filename.gz'
+    (la que genera 2_obtener_post_tiktok.py con COMPRESS = True). Si existen ambas, la más reciente.
     """
-    words = text.split()
-    filtered_words = [word for word in words if word not in stop_words]
-    return " ".join(filtered_words)
+    candidates = [path for path in (filename, filename + '.gz') if os.path.exists(path)]
+    return max(candidates, key=os.path.getmtime) if candidates else filename
 
 def main():
     """
     Función principal para procesar el texto y generar la nube de palabras.
     """
-    input_filename = "base_de_datos_tiktok.csv"
+    input_filename = find_database("base_de_datos_tiktok.csv")
     output_folder = "discurso_perfiles"
 
     if not os.path.exists(input_filename):
@@ -66,58 +120,24 @@ def main():
 
     # 2. Cargar los datos
     try:
-        df = pd.read_csv(input_filename, encoding='utf-8')
+        # Solo se leen las columnas de texto necesarias, sin inferencia de tipos
+        df = pd.read_csv(
+            input_filename, encoding='utf-8',
+            usecols=['profile_handle', 'description', 'transcript'],
+            dtype=str,
+        )
     except Exception as e:
         print(f"❌ Error al leer el archivo CSV: {e}")
         return
 
-    # Obtener la lista de stopwords
-    spanish_stopwords = get_spanish_stopwords()
-    
-    # 3. Consolidar texto por perfil
-    consolidated_texts = defaultdict(str)
-    for index, row in df.iterrows():
-        perfil = str(row.get('profile_handle', 'desconocido'))
-        descripcion = str(row.get('description', ''))
-        transcripcion = str(row.get('transcript', ''))
-        
-        # Concatenar el texto de descripción y transcripción
-        texto_completo = descripcion + " " + transcripcion
-        consolidated_texts[perfil] += texto_completo + " "
-
-    # 4. Procesar y guardar el texto consolidado y la nube de palabras para cada perfil
-    for perfil, texto_crudo in consolidated_texts.items():
-        print(f"Procesando datos para el perfil: {perfil}")
-        
-        # Preprocesamiento del texto
-        texto_limpio = clean_text(texto_crudo)
-        texto_sin_stopwords = remove_stopwords(texto_limpio, spanish_stopwords)
-        
-        # a. Guardar el texto en un archivo .txt
-        output_txt_path = os.path.join(output_folder, f"{perfil}_corpus.txt")
-        try:
-            with open(output_txt_path, 'w', encoding='utf-8') as f:
-                f.write(texto_sin_stopwords)
-            print(f"  ✔️ Archivo de texto guardado en: {output_txt_path}")
-        except Exception as e:
-            print(f"  ❌ Error al guardar el archivo de texto para {perfil}: {e}")
-            continue
-
-        # b. Generar la nube de palabras
-        if texto_sin_stopwords:
-            wordcloud = WordCloud(width=800, height=400, background_color='white').generate(texto_sin_stopwords)
-            plt.figure(figsize=(10, 5))
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis("off")
-            output_png_path = os.path.join(output_folder, f"{perfil}_world_cloud.png")
-            try:
-                plt.savefig(output_png_path)
-                print(f"  ✔️ Nube de palabras guardada en: {output_png_path}")
-                plt.close() # Cierra la figura para evitar que se muestren en pantalla
-            except Exception as e:
-                print(f"  ❌ Error al guardar la nube de palabras para {perfil}: {e}")
-        else:
-            print(f"  ⚠️ No hay texto suficiente para generar la nube de palabras de {perfil}.")
+    # 3. Limpiar el texto de cada publicación y consolidarlo por perfil
+    texto_completo = df['description'].fillna('').astype(str) + " " + df['transcript'].fillna('').astype(str)
+    df['_text'] = clean_text(texto_completo)
+    consolidated_texts = df.groupby(df['profile_handle'].astype(str), sort=False)['_text'].agg(' '.join)
+
+    # 4. Procesar y guardar el texto consolidado y la nube de palabras de cada perfil (un proceso por núcleo)
+    with ProcessPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        list(pool.map(partial(render_profile, output_folder), consolidated_texts.index, consolidated_texts.values))
 
     print("\n🎉 Proceso de consolidación de texto y generación de nubes de palabras completado.")
 
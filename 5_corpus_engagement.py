@@ -1,8 +1,12 @@
 # main.py
 import pandas as pd
+import numpy as np
 import os
 import re
-from collections import defaultdict
+
+# Patrón único de limpieza de texto: URLs, menciones/hashtags y cualquier carácter
+# que no sea letra o espacio, eliminados en una sola pasada
+_CLEAN_RE = re.compile(r'http\S+|www\S+|@\w+|#\w+|[^a-zA-ZáéíóúüñÁÉÍÓÚÜÑ \t\n\r\f\v]')
 
 def get_spanish_stopwords() -> set:
     """
@@ -22,31 +26,36 @@ def get_spanish_stopwords() -> set:
         'eso', 'está', 'fui', 'fue', 'fuimos', 'fueron'
     }
 
-def clean_text(text: str) -> str:
+# Alternación de stopwords (las más largas primero) para eliminarlas en una sola pasada
+_STOPWORD_RE = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, sorted(get_spanish_stopwords(), key=len, reverse=True))) + r')\b\s*'
+)
+
+def clean_text(texts: pd.Series) -> pd.Series:
+    """
+    Limpia una serie de textos, eliminando URLs, menciones, emojis y caracteres especiales.
+    """
+    return texts.fillna('').astype(str).str.replace(_CLEAN_RE, '', regex=True).str.lower()
+
+def remove_stopwords(text: str) -> str:
     """
-    Limpia el texto, eliminando URLs, menciones, emojis y caracteres especiales.
+    Elimina las stopwords del texto y normaliza los espacios.
     """
-    if not isinstance(text, str):
-        return ""
-    text = re.sub(r'http\S+|www\S+|https\S+', '', text, flags=re.MULTILINE)
-    text = re.sub(r'@\w+|#\w+', '', text)
-    text = re.sub(r'[^a-zA-ZáéíóúüñÁÉÍÓÚÜÑ\s]', '', text, re.I|re.A)
-    text = text.lower()
-    return text
+    return " ".join(_STOPWORD_RE.sub('', text).split())
 
-def remove_stopwords(text: str, stop_words: set) -> str:
+def find_database(filename: str) -> str:
     """
-    Elimina las stopwords del texto.
+    Devuelve la ruta de la base de datos: 'filename' o su versión comprimida 'filename.gz'
+    (la que genera 2_obtener_post_tiktok.py con COMPRESS = True). Si existen ambas, la más reciente.
     """
-    words = text.split()
-    filtered_words = [word for word in words if word not in stop_words]
-    return " ".join(filtered_words)
+    candidates = [path for path in (filename, filename + '.gz') if os.path.exists(path)]
+    return max(candidates, key=os.path.getmtime) if candidates else filename
 
 def main():
     """
     Función principal para procesar los datos de engagement y generar los corpus.
     """
-    input_filename = "base_de_datos_tiktok.csv"
+    input_filename = find_database("base_de_datos_tiktok.csv")
     output_folder = "discurso_mayor_engagement"
 
     if not os.path.exists(input_filename):
@@ -60,36 +69,37 @@ def main():
 
     # 2. Cargar los datos
     try:
-        df = pd.read_csv(input_filename, encoding='utf-8')
+        # Solo se leen las columnas necesarias para el engagement y el corpus
+        df = pd.read_csv(
+            input_filename, encoding='utf-8',
+            usecols=['profile_handle', 'description', 'transcript', 'play_count', 'digg_count', 'comment_count'],
+            dtype={'profile_handle': str, 'description': str, 'transcript': str,
+                   'play_count': 'float64', 'digg_count': 'float64', 'comment_count': 'float64'},
+        )
     except Exception as e:
         print(f"❌ Error al leer el archivo CSV: {e}")
         return
 
     # 3. Calcular el engagement para cada publicación
-    # Manejar el caso de play_count igual a 0 para evitar ZeroDivisionError
-    df['play_count'] = df['play_count'].replace(0, 1)
-    df['engagement'] = (df['digg_count'] + df['comment_count']) / df['play_count']
+    # Los posts con play_count igual a 0 quedan con engagement 0 (sin dividir por cero)
+    play_count = df['play_count'].to_numpy()
+    df['engagement'] = np.divide(
+        df['digg_count'].to_numpy() + df['comment_count'].to_numpy(),
+        play_count,
+        out=np.zeros(len(df)),
+        where=play_count != 0,
+    )
 
     # 4. Obtener los 5 posts con mayor engagement por perfil
-    top_5_posts = df.sort_values('engagement', ascending=False).groupby('profile_handle').head(5)
+    # Selección parcial por grupo (nlargest), sin ordenar toda la base
+    top_idx = df.groupby('profile_handle')['engagement'].nlargest(5).index.get_level_values(-1)
+    top_5_posts = df.loc[top_idx]
 
     # 5. Consolidar el texto y guardar los archivos
-    spanish_stopwords = get_spanish_stopwords()
-    consolidated_texts = defaultdict(str)
-
-    for index, row in top_5_posts.iterrows():
-        perfil = str(row.get('profile_handle', 'desconocido'))
-        descripcion = str(row.get('description', ''))
-        transcripcion = str(row.get('transcript', ''))
-        
-        # Concatenar el texto de descripción y transcripción
-        texto_completo = descripcion + " " + transcripcion
-        
-        # Preprocesamiento del texto
-        texto_limpio = clean_text(texto_completo)
-        texto_sin_stopwords = remove_stopwords(texto_limpio, spanish_stopwords)
-        
-        consolidated_texts[perfil] += texto_sin_stopwords + " "
+    texto_completo = top_5_posts['description'].fillna('').astype(str) + " " + top_5_posts['transcript'].fillna('').astype(str)
+    textos_limpios = clean_text(texto_completo)
+    consolidated_texts = textos_limpios.groupby(top_5_posts['profile_handle'].astype(str), sort=False).agg(' '.join)
+    consolidated_texts = consolidated_texts.map(remove_stopwords)
 
     # 6. Guardar el corpus consolidado en archivos individuales
     for perfil, corpus in consolidated_texts.items():
@@ -1,5 +1,6 @@
 import google.generativeai as genai
 import os
+from pathlib import Path
 import re
 from config import GEMINI_API_KEY # Asegúrate de que tu clave API esté en el archivo config.py
 
@@ -14,17 +15,21 @@ OUTPUT_FOLDER = "analisis_discurso_engagement"
 MODEL_NAME = 'gemini-2.5-flash'
 # ------------------
 
+# Modelo creado una sola vez en configure_api() y reutilizado en cada llamada
+_MODEL = None
+
 def configure_api():
-    """Configura la API de Gemini con la clave proporcionada."""
+    """Configura la API de Gemini con la clave proporcionada y crea el modelo."""
+    global _MODEL
     genai.configure(api_key=GEMINI_API_KEY)
+    _MODEL = genai.GenerativeModel(MODEL_NAME)
 
 def generate_llm_response(prompt: str) -> str or None:
     """
     Envía el prompt al modelo de Gemini y retorna la respuesta.
     """
     try:
-        model = genai.GenerativeModel(MODEL_NAME)
-        response = model.generate_content(prompt)
+        response = _MODEL.generate_content(prompt)
         return response.text
     except Exception as e:
         print(f"❌ Error al llamar a la API de Gemini: {e}")
@@ -43,23 +48,21 @@ def main():
         print(f"Carpeta '{OUTPUT_FOLDER}' creada exitosamente.")
 
     # 3. Leer los archivos de corpus de texto de la nueva carpeta
-    corpus_files = [f for f in os.listdir(INPUT_FOLDER) if f.endswith('_corpus_engagement.txt')]
+    corpus_files = list(Path(INPUT_FOLDER).glob('*_corpus_engagement.txt'))
 
     if not corpus_files:
         print(f"No se encontraron archivos de corpus en la carpeta '{INPUT_FOLDER}'.")
         return
 
     # 4. Iterar sobre cada archivo y generar el análisis
-    for filename in corpus_files:
+    for file_path in corpus_files:
         # Extraer el nombre del perfil del nombre del archivo
-        profile_name = filename.replace('_corpus_engagement.txt', '')
-        file_path = os.path.join(INPUT_FOLDER, filename)
+        profile_name = file_path.name.removesuffix('_corpus_engagement.txt')
         
         print(f"\nAnalizando el discurso del perfil: {profile_name}...")
 
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                corpus_text = f.read()
+            corpus_text = file_path.read_text(encoding='utf-8')
             
             # 5. Rellenar el prompt con el texto del corpus, usando el prompt de análisis político
             MASTER_PROMPT = """
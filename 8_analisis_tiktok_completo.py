@@ -1,11 +1,30 @@
 import pandas as pd
 import numpy as np
 import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta  # <--- Agregamos timedelta
+import matplotlib
+matplotlib.use('Agg')  # Backend sin ventana: los gráficos solo se guardan como PNG
 import matplotlib.pyplot as plt
 import seaborn as sns
 import warnings
 
+# pyarrow (opcional) lee el CSV en varios hilos y permite guardar la data filtrada en Parquet;
+# si no está instalado se usa el lector de pandas y la data filtrada se guarda en CSV.
+# Los CSV de reporte siempre se escriben con pandas, así su formato no depende de pyarrow.
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = pacsv = None
+
+# numba (opcional) compila el cálculo de ERV en un solo recorrido para bases muy grandes;
+# si no está instalado (o la base es pequeña) se usa la versión vectorizada de NumPy
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 # Ignorar advertencias de matplotlib/seaborn que a veces aparecen
 warnings.filterwarnings("ignore")
 
@@ -22,6 +41,17 @@ DAYS_BACK = 31  # <--- CAMBIA ESTE NÚMERO (Ej: 30, 60, 90 días)
 START_DATE = TODAY - timedelta(days=DAYS_BACK)
 # ----------------------------------------------------
 
+# Guardar también los CSV intermedios que solo alimentan gráficos (p. ej. 03_plot_engagement_ratios_data.csv)
+EMIT_DEBUG_CSVS = False
+
+# Generar además el gráfico de barras y el heatmap de ERV como PNG separados
+EMIT_SEPARATE_ERV_CHARTS = False
+
+# Resolución de los PNG generados
+PLOT_DPI = 100
+# Procesos que dibujan los gráficos en paralelo (son independientes entre sí)
+PLOT_WORKERS = min(4, os.cpu_count() or 1)
+
 # ⚠️ La carpeta de salida incluye la fecha de ejecución ⚠️
 FOLDER_NAME = f"analisis_{TODAY.strftime('%Y%m%d')}"
 
@@ -35,6 +65,46 @@ ERV_NAMES = [
     'ERV_Downloads', 'ERV_Reposts', 'ERV_WhatsApp'
 ]
 
+# Columnas que usa el análisis (las demás, como 'transcript', no se cargan)
+INPUT_COLUMNS = [
+    'profile_handle', 'video_id', 'description', 'create_time', 'readable_date', 'url',
+    'play_count'
+] + ENGAGEMENT_METRICS
+# Formato con el que 2_obtener_post_tiktok.py escribe 'readable_date'
+READABLE_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+# Columnas de texto: se leen como str para evitar la inferencia de tipos
+TEXT_DTYPES = {'profile_handle': str, 'video_id': str, 'description': str, 'url': str, 'readable_date': str}
+# Desde cuántas filas compensa compilar el kernel de numba (la compilación tarda ~1 s)
+NUMBA_MIN_ROWS = 1_000_000
+
+def read_input_csv(filename: str) -> pd.DataFrame:
+    """Lee del CSV solo las columnas de INPUT_COLUMNS que existan en el archivo."""
+    if pacsv is None:
+        # Las columnas ausentes se toleran (p. ej. 'create_time' en bases antiguas)
+        return pd.read_csv(filename, usecols=lambda col: col in INPUT_COLUMNS, dtype=TEXT_DTYPES)
+
+    header = pd.read_csv(filename, nrows=0).columns
+    columns = [col for col in INPUT_COLUMNS if col in header]
+    table = pacsv.read_csv(
+        filename,
+        # Las descripciones pueden contener saltos de línea dentro de las comillas
+        parse_options=pacsv.ParseOptions(newlines_in_values=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            column_types={col: pa.string() for col in TEXT_DTYPES if col in columns},
+            strings_can_be_null=True,  # celdas vacías como NaN, igual que pandas
+        ),
+    )
+    return table.to_pandas()
+
+def find_database(filename: str) -> str:
+    """
+    Devuelve la ruta de la base de datos: 'filename' o su versión comprimida 'filename.gz'
+    (la que genera 2_obtener_post_tiktok.py con COMPRESS = True). Si existen ambas, la más reciente.
+    """
+    candidates = [path for path in (filename, filename + '.gz') if os.path.exists(path)]
+    return max(candidates, key=os.path.getmtime) if candidates else filename
+
 def setup_environment():
     """Crea la carpeta de salida y carga el DataFrame."""
     
@@ -47,23 +117,131 @@ def setup_environment():
 
     # Cargar los datos
     try:
-        df = pd.read_csv(INPUT_FILE)
-        print(f"Archivo '{INPUT_FILE}' cargado. Filas totales: {len(df)}")
+        input_file = find_database(INPUT_FILE)
+        df = read_input_csv(input_file)
+        print(f"Archivo '{input_file}' cargado. Filas totales: {len(df)}")
     except FileNotFoundError:
-        print(f"❌ Error: El archivo '{INPUT_FILE}' no se encontró.")
+        print(f"❌ Error: El archivo '{input_file}' no se encontró.")
         return None
 
     # Limpieza: Asegurar que las columnas de fecha y conteo sean correctas
-    # NOTA: Si tus fechas son Dia/Mes/Año y tienes problemas, cambia esto a: pd.to_datetime(..., dayfirst=True)
-    df['readable_date'] = pd.to_datetime(df['readable_date'], errors='coerce')
+    # Con el formato explícito no se infiere el formato fila por fila.
+    # NOTA: Si tus fechas tienen otro formato (p. ej. Dia/Mes/Año), ajusta READABLE_DATE_FORMAT
+    df['readable_date'] = pd.to_datetime(df['readable_date'], format=READABLE_DATE_FORMAT, errors='coerce', cache=True)
     
     # Convertir columnas de conteo a tipo numérico (integer)
     count_columns = ['play_count'] + ENGAGEMENT_METRICS
-    for col in count_columns:
-        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
+    df[count_columns] = df[count_columns].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int64')
 
     return df
 
+# =========================================================================
+# GRÁFICOS (se dibujan en procesos aparte, ver PLOT_WORKERS)
+# =========================================================================
+
+def draw_erv_bar_chart(ax, df_plot_data: pd.DataFrame):
+    """Dibuja en 'ax' las barras agrupadas de la ERV promedio por perfil y métrica."""
+    sns.barplot(
+        data=df_plot_data,
+        x='profile_handle',
+        y='Avg_ERV',
+        hue='Metric',
+        palette='viridis',
+        ax=ax
+    )
+    ax.set_title(f'Tasa de Engagement Promedio (Últimos {DAYS_BACK} días)', fontsize=16)
+    ax.set_xlabel('Perfil', fontsize=14)
+    ax.set_ylabel('Tasa de Engagement Promedio (%)', fontsize=14)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    ax.legend(title='Métrica de Interacción', bbox_to_anchor=(1.05, 1), loc='upper left')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+
+def draw_erv_heatmap(ax, df_heatmap: pd.DataFrame):
+    """Dibuja en 'ax' el heatmap (mapa de calor) de la ERV promedio por perfil y métrica."""
+    sns.heatmap(
+        df_heatmap,
+        annot=True,
+        fmt=".2f",
+        cmap="YlGnBu",
+        linewidths=.5,
+        cbar_kws={'label': 'Tasa de Engagement Promedio (%)'},
+        ax=ax
+    )
+    ax.set_title(f'Heatmap de Engagement (Últimos {DAYS_BACK} días)', fontsize=16)
+    ax.set_ylabel('Perfil', fontsize=14)
+    ax.set_xlabel('Métrica de Engagement (ERV)', fontsize=14)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    plt.setp(ax.get_yticklabels(), rotation=0)
+
+def render_erv_combined_chart(df_plot_data: pd.DataFrame, df_heatmap: pd.DataFrame, output_png: str):
+    """Barras agrupadas y heatmap de la ERV en una sola figura (un solo renderizado y PNG)."""
+    fig, (ax_bar, ax_heatmap) = plt.subplots(1, 2, figsize=(28, 10))
+    draw_erv_bar_chart(ax_bar, df_plot_data)
+    draw_erv_heatmap(ax_heatmap, df_heatmap)
+    fig.tight_layout()
+
+    fig.savefig(output_png, dpi=PLOT_DPI)
+    plt.close(fig)
+    print(f"Gráfico de Barras y Heatmap de ERV guardados en: {output_png}")
+
+def render_erv_bar_chart(df_plot_data: pd.DataFrame, output_png: str):
+    """Gráfico de barras agrupadas de la ERV promedio por perfil y métrica."""
+    fig, ax = plt.subplots(figsize=(14, 8))
+    draw_erv_bar_chart(ax, df_plot_data)
+    fig.tight_layout()
+
+    fig.savefig(output_png, dpi=PLOT_DPI)
+    plt.close(fig)
+    print(f"Gráfico de Barras guardado en: {output_png}")
+
+def render_erv_heatmap(df_heatmap: pd.DataFrame, output_png: str):
+    """Heatmap (mapa de calor) de la ERV promedio por perfil y métrica."""
+    fig, ax = plt.subplots(figsize=(12, 10))
+    draw_erv_heatmap(ax, df_heatmap)
+    fig.tight_layout()
+
+    fig.savefig(output_png, dpi=PLOT_DPI)
+    plt.close(fig)
+    print(f"Heatmap guardado en: {output_png}")
+
+def render_daily_posts_chart(df_daily_posts: pd.DataFrame, output_png: str):
+    """Gráfico de líneas de la cantidad de posts diarios por perfil."""
+    fig, ax = plt.subplots(figsize=(14, 6))
+    sns.lineplot(
+        data=df_daily_posts, x='date_only', y='posts_count', hue='profile_handle',
+        marker='o', dashes=False, palette='Spectral', ax=ax
+    )
+    ax.set_title(f'Posts Diarios - Últimos {DAYS_BACK} días', fontsize=16)
+    ax.set_xlabel('Fecha', fontsize=14)
+    ax.set_ylabel('Cantidad de Posts', fontsize=14)
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    ax.grid(axis='y', linestyle='--', alpha=0.7)
+    ax.legend(title='Perfil', bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.tight_layout()
+
+    fig.savefig(output_png, dpi=PLOT_DPI)
+    plt.close(fig)
+    print(f"6.A. Gráfico de Líneas guardado en: {output_png}")
+
+def render_optimal_hour_chart(df_optimal_hour: pd.DataFrame, output_png: str):
+    """Gráfico de líneas de las vistas promedio por hora de publicación y perfil."""
+    fig, ax = plt.subplots(figsize=(14, 6))
+    sns.lineplot(
+        data=df_optimal_hour, x='hour', y='avg_play_count', hue='profile_handle',
+        marker='o', dashes=False, palette='Spectral', ax=ax
+    )
+    ax.set_title('Vistas Promedio por Hora de Publicación (Optimal Hour)', fontsize=16)
+    ax.set_xlabel('Hora del Día (0-23)', fontsize=14)
+    ax.set_ylabel('Vistas Promedio (Play Count)', fontsize=14)
+    ax.set_xticks(range(0, 24))
+    ax.grid(axis='both', linestyle='--', alpha=0.7)
+    ax.legend(title='Perfil', bbox_to_anchor=(1.05, 1), loc='upper left')
+    fig.tight_layout()
+
+    fig.savefig(output_png, dpi=PLOT_DPI)
+    plt.close(fig)
+    print(f"6.C. Gráfico de Líneas de hora óptima guardado en: {output_png}")
+
 # =========================================================================
 # 2. PASO 1: PREPARACIÓN Y FILTRADO
 # =========================================================================
@@ -76,9 +254,13 @@ def step_1_data_preparation(df: pd.DataFrame) -> pd.DataFrame:
     # Filtrar los datos: Fecha mayor o igual a la fecha de inicio
     df_filtered = df[df['readable_date'] >= START_DATE].copy()
     
-    # Guardar el DataFrame filtrado
-    output_path = os.path.join(FOLDER_NAME, "01_data_filtrada_rango.csv")
-    df_filtered.to_csv(output_path, index=False)
+    # Guardar el DataFrame filtrado (Parquet tipado y comprimido si pyarrow está disponible)
+    if pa is not None:
+        output_path = os.path.join(FOLDER_NAME, "01_data_filtrada_rango.parquet")
+        df_filtered.to_parquet(output_path, engine='pyarrow', compression='zstd', index=False)
+    else:
+        output_path = os.path.join(FOLDER_NAME, "01_data_filtrada_rango.csv")
+        df_filtered.to_csv(output_path, index=False)
     
     print(f"Filas después del filtrado: {len(df_filtered)}")
     print(f"Datos filtrados guardados en: {output_path}")
@@ -89,6 +271,25 @@ def step_1_data_preparation(df: pd.DataFrame) -> pd.DataFrame:
     else:
          # Fallback si no existe create_time, usar readable_date
         df_filtered['create_time_dt'] = df_filtered['readable_date']
+
+    # Campos de fecha para los Pasos 5 y 6, extraídos una sola vez.
+    # 'date_only' queda como datetime64 (medianoche) en lugar de objetos date de Python.
+    df_filtered['date_only'] = df_filtered['readable_date'].dt.normalize()
+    create_time_dt = df_filtered['create_time_dt'].dt
+    df_filtered['hour'] = create_time_dt.hour
+    df_filtered['day_of_week'] = create_time_dt.dayofweek # 0=Lunes, 6=Domingo
+
+    # Conteos con el tipo entero sin signo más pequeño que los contiene (menos memoria que recorrer al agregar)
+    for col in ['play_count'] + ENGAGEMENT_METRICS:
+        df_filtered[col] = pd.to_numeric(df_filtered[col], downcast='unsigned')
+
+    # Perfil como categoría: las agrupaciones usan sus códigos enteros en lugar de hashear
+    # cadenas (las categorías quedan en orden alfabético y todas aparecen en la data filtrada)
+    df_filtered['profile_handle'] = df_filtered['profile_handle'].astype('category')
+
+    # Ordenar una sola vez por perfil: las agrupaciones por perfil de los pasos siguientes
+    # recorren bloques contiguos y, con sort=False, ya salen en orden alfabético
+    df_filtered = df_filtered.sort_values('profile_handle', kind='stable', ignore_index=True)
     
     return df_filtered
 
@@ -96,7 +297,7 @@ def step_1_data_preparation(df: pd.DataFrame) -> pd.DataFrame:
 # 3. PASO 2: MÉTRICAS BÁSICAS MENSUALES POR PERFIL
 # =========================================================================
 
-def step_2_monthly_summary(df: pd.DataFrame):
+def step_2_monthly_summary(profile_groups):
     """Genera la tabla de resumen de actividad del periodo por perfil."""
     
     print("\n--- PASO 2: Métricas Básicas del Periodo por Perfil (Resumen) ---")
@@ -108,8 +309,8 @@ def step_2_monthly_summary(df: pd.DataFrame):
     for col in ['play_count'] + ENGAGEMENT_METRICS:
         aggregation_functions[col] = 'sum' # Suma de interacciones
 
-    # 2. Aplicar la agregación
-    df_summary = df.groupby('profile_handle').agg(aggregation_functions).reset_index()
+    # 2. Aplicar la agregación (sobre la agrupación por perfil compartida con el Paso 3)
+    df_summary = profile_groups.agg(aggregation_functions).reset_index()
     df_summary = df_summary.rename(columns={'video_id': 'videos_publicados_periodo'})
     
     # 3. Ordenar y guardar
@@ -123,103 +324,116 @@ def step_2_monthly_summary(df: pd.DataFrame):
 # 4. PASO 3: ANÁLISIS DE ENGAGEMENT (RATIOS) Y VISUALIZACIÓN
 # =========================================================================
 
-def step_3_engagement_analysis(df: pd.DataFrame) -> pd.DataFrame:
+if njit is not None:
+    # Sin parallel=True: los hilos de numba (capa TBB) dejan colgado el cierre del proceso
+    # después de que el pool de gráficos hace fork, y el recorrido está limitado por memoria
+    @njit(cache=True)
+    def _engagement_kernel(engagement_values, play_count, erv_out, total_out):
+        """Llena ERV y tasa total fila por fila, sin arreglos temporales."""
+        n_metrics = engagement_values.shape[1]
+        for i in range(engagement_values.shape[0]):
+            plays = play_count[i]
+            scale = 100.0 / plays if plays > 0 else 0.0
+            interactions = 0.0
+            for j in range(n_metrics):
+                value = engagement_values[i, j]
+                erv_out[i, j] = value * scale
+                interactions += value
+            total_out[i] = interactions * scale
+
+def add_engagement_rates(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Calcula la Tasa de Engagement por Vista (ERV) por métrica para cada video,
-    calcula el promedio por perfil y genera gráficos.
+    Calcula la Tasa de Engagement por Vista (ERV) por métrica y la Tasa de Engagement
+    Total para cada video (columnas usadas por los Pasos 3 y 4).
     """
-    
-    print("\n--- PASO 3: Análisis de Engagement (Ratios) y Visualización ---")
-    
-    # Remplazar play_count 0 con 1 para evitar ZeroDivisionError en el denominador,
-    # aunque la fórmula maneja esto para establecer el ERV a 0 en ese caso.
-    # Usaremos np.where para establecer el ratio a 0 si play_count es 0.
-    
-    df_erv_summary = pd.DataFrame({'profile_handle': df['profile_handle'].unique()}).set_index('profile_handle')
-
-    # 1. Cálculo de Tasa de Engagement por Métrica (ERV) por video
+    if njit is not None and len(df) >= NUMBA_MIN_ROWS:
+        engagement_values = np.ascontiguousarray(df[ENGAGEMENT_METRICS].to_numpy(dtype=np.float64, copy=True))
+        play_count = df['play_count'].to_numpy(dtype=np.float64, copy=True)
+        erv = np.empty(engagement_values.shape, dtype=np.float32)
+        total_engagement_rate = np.empty(len(df))
+        _engagement_kernel(engagement_values, play_count, erv, total_engagement_rate)
+        df[ERV_NAMES] = erv
+        df['total_engagement_rate'] = total_engagement_rate
+        return df
+
+    # Los posts con play_count 0 quedan con ratio 0: se divide por un denominador
+    # seguro (1 en esos casos) y luego se ponen a 0 sus filas.
+    # Se piden copias explícitas (con Copy-on-Write, to_numpy() puede devolver una vista de
+    # solo lectura) para que las operaciones siguientes escriban sobre ellas sin más temporales.
+    engagement_values = df[ENGAGEMENT_METRICS].to_numpy(dtype=np.float64, copy=True)
+    play_count = df['play_count'].to_numpy(dtype=np.float64, copy=True)
+    no_plays = play_count <= 0
+    play_count[no_plays] = 1.0
+
+    # Suma de interacciones por video (antes de convertir los conteos en ratios).
+    # Solo se usa para la tasa total: queda en un arreglo local, no como columna del DataFrame.
+    total_engagement_rate = engagement_values.sum(axis=1)
+
+    # 1. Cálculo de Tasa de Engagement por Métrica (ERV) por video, todas las métricas a la vez
     # FÓRMULA: ERV = (Métrica / play_count) * 100
-    for metric, name in zip(ENGAGEMENT_METRICS, ERV_NAMES):
-        # np.where(condición, valor_si_verdadero, valor_si_falso)
-        df[name] = np.where(
-            df['play_count'] > 0,
-            (df[metric] / df['play_count']) * 100,
-            0
-        )
-        # Agregar el promedio al DataFrame resumen por perfil
-        df_erv_summary[name] = df.groupby('profile_handle')[name].mean()
+    np.divide(engagement_values, play_count[:, None], out=engagement_values)
+    engagement_values *= 100
+    engagement_values[no_plays] = 0
+    # float32 basta para porcentajes y reduce a la mitad la memoria que recorren las agregaciones
+    df[ERV_NAMES] = engagement_values.astype(np.float32)
 
     # 2. Calcular la Tasa de Engagement Total por video (para el Paso 4)
-    df['total_interactions'] = df[ENGAGEMENT_METRICS].sum(axis=1)
     # FÓRMULA: Tasa de Engagement Total = (Suma de Interacciones / play_count) * 100
-    df['total_engagement_rate'] = np.where(
-        df['play_count'] > 0,
-        (df['total_interactions'] / df['play_count']) * 100,
-        0
-    )
+    np.divide(total_engagement_rate, play_count, out=total_engagement_rate)
+    total_engagement_rate *= 100
+    total_engagement_rate[no_plays] = 0
+    df['total_engagement_rate'] = total_engagement_rate
+
+    return df
+
+def step_3_engagement_analysis(df: pd.DataFrame, profile_groups, plot_pool) -> list:
+    """
+    Calcula el promedio por perfil de la Tasa de Engagement por Vista (ERV)
+    de cada métrica y encarga sus gráficos a plot_pool (retorna los futuros).
+    """
     
+    print("\n--- PASO 3: Análisis de Engagement (Ratios) y Visualización ---")
+
+    # Promedio por perfil de todas las ERV, con las posiciones de fila que la agrupación
+    # compartida con el Paso 2 ya calculó (sin volver a hashear la columna de perfil)
+    erv_block = df[ERV_NAMES].to_numpy()
+    group_rows = profile_groups.indices
+    df_erv_means = pd.DataFrame(
+        np.stack([erv_block[rows].mean(axis=0, dtype=np.float64) for rows in group_rows.values()]).astype(np.float32),
+        index=pd.Index(list(group_rows), name='profile_handle'),
+        columns=ERV_NAMES,
+    )
+
     # 3. Guardar el resumen de promedios de ERV por perfil
-    df_erv_summary = df_erv_summary.reset_index()
+    df_erv_summary = df_erv_means.reset_index()
     output_path = os.path.join(FOLDER_NAME, "03_profile_engagement_ratios.csv")
     df_erv_summary.to_csv(output_path, index=False)
     print(f"Tabla de promedios de ERV guardada en: {output_path}")
     
-    # 4. Preparación de datos para Visualización (Long format)
-    df_plot_data = df_erv_summary.melt(
-        id_vars='profile_handle',
-        var_name='Metric',
-        value_name='Avg_ERV'
-    )
-    output_plot_data = os.path.join(FOLDER_NAME, "03_plot_engagement_ratios_data.csv")
-    df_plot_data.to_csv(output_plot_data, index=False)
-    print(f"Datos para la visualización guardados en: {output_plot_data}")
-    
-    # 5. Generar Gráfico de Barras Agrupadas
-    plt.figure(figsize=(14, 8))
-    sns.barplot(
-        data=df_plot_data,
-        x='profile_handle',
-        y='Avg_ERV',
-        hue='Metric',
-        palette='viridis'
-    )
-    plt.title(f'Tasa de Engagement Promedio (Últimos {DAYS_BACK} días)', fontsize=16)
-    plt.xlabel('Perfil', fontsize=14)
-    plt.ylabel('Tasa de Engagement Promedio (%)', fontsize=14)
-    plt.xticks(rotation=45, ha='right')
-    plt.legend(title='Métrica de Interacción', bbox_to_anchor=(1.05, 1), loc='upper left')
-    plt.grid(axis='y', linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    
-    output_png = os.path.join(FOLDER_NAME, "03_ERV_bar_chart.png")
-    plt.savefig(output_png)
-    plt.close()
-    print(f"Gráfico de Barras guardado en: {output_png}")
-    
-    # 6. Generar Heatmap (Mapa de Calor)
+    # 4. Preparación de datos para Visualización (Long format), construida directamente
+    # desde la matriz (perfiles x métricas): una métrica tras otra, como lo haría melt
+    profiles = df_erv_means.index.to_numpy()
+    df_plot_data = pd.DataFrame({
+        'profile_handle': np.tile(profiles, len(ERV_NAMES)),
+        'Metric': np.repeat(ERV_NAMES, len(profiles)),
+        'Avg_ERV': df_erv_means.to_numpy().ravel(order='F'),
+    })
+    if EMIT_DEBUG_CSVS:
+        output_plot_data = os.path.join(FOLDER_NAME, "03_plot_engagement_ratios_data.csv")
+        df_plot_data.to_csv(output_plot_data, index=False)
+        print(f"Datos para la visualización guardados en: {output_plot_data}")
+    
+    # 5. Generar Gráfico de Barras Agrupadas y 6. Heatmap (Mapa de Calor), en una sola figura
     df_heatmap = df_erv_summary.set_index('profile_handle')
-    plt.figure(figsize=(12, 10))
-    sns.heatmap(
-        df_heatmap,
-        annot=True,
-        fmt=".2f",
-        cmap="YlGnBu",
-        linewidths=.5,
-        cbar_kws={'label': 'Tasa de Engagement Promedio (%)'}
-    )
-    plt.title(f'Heatmap de Engagement (Últimos {DAYS_BACK} días)', fontsize=16)
-    plt.ylabel('Perfil', fontsize=14)
-    plt.xlabel('Métrica de Engagement (ERV)', fontsize=14)
-    plt.xticks(rotation=45, ha='right')
-    plt.yticks(rotation=0)
-    plt.tight_layout()
-    
-    output_png = os.path.join(FOLDER_NAME, "03_ERV_heatmap.png")
-    plt.savefig(output_png)
-    plt.close()
-    print(f"Heatmap guardado en: {output_png}")
-    
-    return df
+    plot_futures = [
+        plot_pool.submit(render_erv_combined_chart, df_plot_data, df_heatmap, os.path.join(FOLDER_NAME, "03_ERV_combined.png")),
+    ]
+    if EMIT_SEPARATE_ERV_CHARTS:
+        plot_futures += [
+            plot_pool.submit(render_erv_bar_chart, df_plot_data, os.path.join(FOLDER_NAME, "03_ERV_bar_chart.png")),
+            plot_pool.submit(render_erv_heatmap, df_heatmap, os.path.join(FOLDER_NAME, "03_ERV_heatmap.png")),
+        ]
+    return plot_futures
 
 # =========================================================================
 # 5. PASO 4: TOP 3 PUBLICACIONES CON MAYOR ENGAGEMENT
@@ -230,17 +444,18 @@ def step_4_top_3_posts(df: pd.DataFrame):
     
     print("\n--- PASO 4: Top 3 de Publicaciones con Mayor Engagement ---")
     
-    # 1. El cálculo de 'total_engagement_rate' se realizó en el Paso 3
-    # Ordenar por Tasa de Engagement Total y seleccionar el Top 3
-    df_top_3 = df.sort_values(by='total_engagement_rate', ascending=False).head(3)
-
-    # 2. Seleccionar y formatear columnas
+    # 1. El cálculo de 'total_engagement_rate' se realizó antes del Paso 2 (add_engagement_rates)
+    # 2. Seleccionar el Top 3 (selección parcial, sin ordenar toda la tabla) y formatear
+    # columnas en una sola construcción, sin .copy() intermedio.
     # Intentamos mantener solo las columnas que existan para evitar errores
     cols_to_keep = ['profile_handle', 'description', 'url', 'video_id', 'total_engagement_rate']
     existing_cols = [c for c in cols_to_keep if c in df.columns]
-    
-    df_top_3 = df_top_3[existing_cols].copy()
-    df_top_3['total_engagement_rate'] = df_top_3['total_engagement_rate'].round(2)
+
+    df_top_3 = (
+        df.nlargest(3, 'total_engagement_rate')
+        .assign(total_engagement_rate=lambda x: x['total_engagement_rate'].round(2))
+        [existing_cols]
+    )
 
     # 3. Guardar el resultado en CSV
     output_path = os.path.join(FOLDER_NAME, "04_top_3_posts.csv")
@@ -252,9 +467,10 @@ def step_4_top_3_posts(df: pd.DataFrame):
 # 6. PASOS 5 Y 6: ANÁLISIS DE TENDENCIA Y OPORTUNIDAD
 # =========================================================================
 
-def step_5_6_advanced_analysis(df: pd.DataFrame):
+def step_5_6_advanced_analysis(df: pd.DataFrame, plot_pool) -> list:
     """
     Realiza análisis de frecuencia diaria, longitud de contenido y tiempo óptimo.
+    Los gráficos se encargan a plot_pool (retorna los futuros).
     """
     
     print("\n--- PASO 5/6: Análisis de Tendencia y Oportunidad ---")
@@ -263,13 +479,12 @@ def step_5_6_advanced_analysis(df: pd.DataFrame):
     # 6.A. Análisis de Frecuencia de Publicación Diaria (Paso 5)
     # -----------------------------------------------------------
     
-    # 1. Extraer solo la fecha
-    df['date_only'] = df['readable_date'].dt.date
+    plot_futures = []
+
+    # 1. La fecha ('date_only') se extrajo en el Paso 1
     
     # 2. Contar la cantidad de posts diarios por perfil
-    df_daily_posts = df.groupby(['date_only', 'profile_handle']).agg(
-        posts_count=('video_id', 'count')
-    ).reset_index()
+    df_daily_posts = df.groupby(['date_only', 'profile_handle'], observed=True).size().reset_index(name='posts_count')
 
     if not df_daily_posts.empty:
         # 3. Guardar la tabla de datos diarios (CSV)
@@ -279,27 +494,10 @@ def step_5_6_advanced_analysis(df: pd.DataFrame):
         df_daily_posts_csv.to_csv(output_path_csv, index=False)
         print(f"6.A. Tabla de posts diarios guardada en: {output_path_csv}")
 
-        # 4. Generar Gráfico de Líneas
-        df_plot = df_daily_posts.copy()
-        df_plot['date_only'] = pd.to_datetime(df_plot['date_only'])
-        
-        plt.figure(figsize=(14, 6))
-        sns.lineplot(
-            data=df_plot, x='date_only', y='posts_count', hue='profile_handle',
-            marker='o', dashes=False, palette='Spectral'
-        )
-        plt.title(f'Posts Diarios - Últimos {DAYS_BACK} días', fontsize=16)
-        plt.xlabel('Fecha', fontsize=14)
-        plt.ylabel('Cantidad de Posts', fontsize=14)
-        plt.xticks(rotation=45, ha='right')
-        plt.grid(axis='y', linestyle='--', alpha=0.7)
-        plt.legend(title='Perfil', bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-
-        output_path_png = os.path.join(FOLDER_NAME, "05_daily_post_line_chart.png")
-        plt.savefig(output_path_png)
-        plt.close()
-        print(f"6.A. Gráfico de Líneas guardado en: {output_path_png}")
+        # 4. Generar Gráfico de Líneas ('date_only' ya es datetime64)
+        plot_futures.append(plot_pool.submit(
+            render_daily_posts_chart, df_daily_posts, os.path.join(FOLDER_NAME, "05_daily_post_line_chart.png")
+        ))
 
     # -----------------------------------------------------------
     # 6.B. Análisis de Longitud de Contenido
@@ -307,13 +505,13 @@ def step_5_6_advanced_analysis(df: pd.DataFrame):
     
     if 'description' in df.columns:
         # 1. Calcular la longitud del contenido
-        df['description_length'] = df['description'].fillna('').astype(str).apply(len)
+        df['description_length'] = df['description'].fillna('').str.len()
         
         # Agrupar solo por lo que existe
         group_cols = ['profile_handle']
         
         # 2. Agrupar y calcular el promedio de longitud
-        df_content_length = df.groupby(group_cols)[['description_length']].mean().reset_index()
+        df_content_length = df.groupby(group_cols, observed=True, sort=False)[['description_length']].mean().reset_index()
         
         # 3. Guardar la tabla (CSV)
         output_path = os.path.join(FOLDER_NAME, "06b_content_length_summary.csv")
@@ -324,15 +522,37 @@ def step_5_6_advanced_analysis(df: pd.DataFrame):
     # 6.C. Análisis de Oportunidad por Hora y Día (Optimal Time)
     # -----------------------------------------------------------
     
-    # 1. Extraer hora y día de la semana
-    df['hour'] = df['create_time_dt'].dt.hour
-    df['day_of_week'] = df['create_time_dt'].dt.dayofweek # 0=Lunes, 6=Domingo
+    # 1. La hora y el día de la semana ('hour', 'day_of_week') se extrajeron en el Paso 1
     day_map = {0: 'Lunes', 1: 'Martes', 2: 'Miércoles', 3: 'Jueves', 4: 'Viernes', 5: 'Sábado', 6: 'Domingo'}
 
+    # Una sola pasada por la data con np.bincount: suma y cantidad de play_count en una
+    # cuadrícula densa perfil x hora (24) x día (7), sin el indexador hash de groupby.
+    # Los promedios por hora y por día se derivan de esta cuadrícula.
+    profiles = df['profile_handle'].cat.categories
+    profile_codes = df['profile_handle'].cat.codes.to_numpy().astype(np.int64)
+    hours = df['hour'].to_numpy()
+    days = df['day_of_week'].to_numpy()
+    valid = (profile_codes >= 0) & ~np.isnan(hours) & ~np.isnan(days)
+    slots = (profile_codes[valid] * 24 + hours[valid].astype(np.int64)) * 7 + days[valid].astype(np.int64)
+    grid_shape = (len(profiles), 24, 7)
+    play_sums = np.bincount(
+        slots, weights=df['play_count'].to_numpy(dtype=np.float64)[valid], minlength=np.prod(grid_shape)
+    ).reshape(grid_shape)
+    play_counts = np.bincount(slots, minlength=np.prod(grid_shape)).reshape(grid_shape)
+
+    def average_plays_by(time_col: str, other_axis: int) -> pd.DataFrame:
+        # Filas ordenadas por tiempo y luego perfil, solo para combinaciones con posts
+        sums = play_sums.sum(axis=other_axis).T
+        counts = play_counts.sum(axis=other_axis).T
+        time_idx, profile_idx = np.nonzero(counts)
+        return pd.DataFrame({
+            time_col: time_idx,
+            'profile_handle': pd.Categorical.from_codes(profile_idx, categories=profiles),
+            'avg_play_count': sums[time_idx, profile_idx] / counts[time_idx, profile_idx],
+        })
+
     # 2. Hora Óptima: Agrupar por hora y perfil, y calcular el promedio de play_count
-    df_optimal_hour = df.groupby(['hour', 'profile_handle']).agg(
-        avg_play_count=('play_count', 'mean')
-    ).reset_index()
+    df_optimal_hour = average_plays_by('hour', other_axis=2)
 
     if not df_optimal_hour.empty:
         # 3. Guardar la tabla de hora óptima (CSV)
@@ -341,27 +561,12 @@ def step_5_6_advanced_analysis(df: pd.DataFrame):
         print(f"6.C. Tabla de hora óptima guardada en: {output_path_hour}")
 
         # 4. Generar Gráfico de Líneas para Hora Óptima
-        plt.figure(figsize=(14, 6))
-        sns.lineplot(
-            data=df_optimal_hour, x='hour', y='avg_play_count', hue='profile_handle',
-            marker='o', dashes=False, palette='Spectral'
-        )
-        plt.title('Vistas Promedio por Hora de Publicación (Optimal Hour)', fontsize=16)
-        plt.xlabel('Hora del Día (0-23)', fontsize=14)
-        plt.ylabel('Vistas Promedio (Play Count)', fontsize=14)
-        plt.xticks(range(0, 24))
-        plt.grid(axis='both', linestyle='--', alpha=0.7)
-        plt.legend(title='Perfil', bbox_to_anchor=(1.05, 1), loc='upper left')
-        plt.tight_layout()
-        output_path_png = os.path.join(FOLDER_NAME, "06c_optimal_hour_line_chart.png")
-        plt.savefig(output_path_png)
-        plt.close()
-        print(f"6.C. Gráfico de Líneas de hora óptima guardado en: {output_path_png}")
+        plot_futures.append(plot_pool.submit(
+            render_optimal_hour_chart, df_optimal_hour, os.path.join(FOLDER_NAME, "06c_optimal_hour_line_chart.png")
+        ))
     
     # 5. Día Óptimo: Agrupar por día de la semana y perfil, y calcular el promedio de play_count
-    df_optimal_day = df.groupby(['day_of_week', 'profile_handle']).agg(
-        avg_play_count=('play_count', 'mean')
-    ).reset_index()
+    df_optimal_day = average_plays_by('day_of_week', other_axis=1)
     
     # 6. Guardar la tabla de día óptimo (CSV)
     df_optimal_day['day_name'] = df_optimal_day['day_of_week'].map(day_map)
@@ -369,6 +574,8 @@ def step_5_6_advanced_analysis(df: pd.DataFrame):
     df_optimal_day.to_csv(output_path_day, index=False)
     print(f"6.C. Tabla de día óptimo guardada en: {output_path_day}")
 
+    return plot_futures
+
 
 # =========================================================================
 # FUNCIÓN PRINCIPAL DE EJECUCIÓN
@@ -381,10 +588,19 @@ def main():
         df_filtered = step_1_data_preparation(df)
         
         if len(df_filtered) > 0:
-            step_2_monthly_summary(df_filtered)
-            df_with_erv = step_3_engagement_analysis(df_filtered)
-            step_4_top_3_posts(df_with_erv)
-            step_5_6_advanced_analysis(df_with_erv)
+            df_with_erv = add_engagement_rates(df_filtered)
+            # Una sola agrupación por perfil para los resúmenes de los Pasos 2 y 3
+            profile_groups = df_with_erv.groupby('profile_handle', observed=True, sort=False)
+            step_2_monthly_summary(profile_groups)
+
+            # Los gráficos se dibujan en procesos aparte mientras continúan los demás pasos
+            with ProcessPoolExecutor(max_workers=PLOT_WORKERS) as plot_pool:
+                plot_futures = step_3_engagement_analysis(df_with_erv, profile_groups, plot_pool)
+                step_4_top_3_posts(df_with_erv)
+                plot_futures += step_5_6_advanced_analysis(df_with_erv, plot_pool)
+                # Esperar a que terminen todos (y propagar cualquier error de dibujo)
+                for future in plot_futures:
+                    future.result()
             
             print(f"\n✅ Análisis finalizado. Los resultados están en la carpeta:", FOLDER_NAME)
         else: